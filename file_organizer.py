@@ -3,14 +3,25 @@ FileOrganizer module for Smart File Organizer
 Main logic for scanning, organizing, and moving files
 """
 
+import errno
 import os
 import shutil
+import stat
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from file_utils import DIR_FD_MOVES, IO_WORKERS, copy_fast
 from logger import Logger
 from undo_manager import UndoManager
 
 
+# Per-file entry in organize_files() results when detailed results are requested
+FileRecord = namedtuple('FileRecord', 'name final_path status error')
+
+
 class FileOrganizer:
     """Main class for organizing files by extension"""
     
@@ -46,63 +57,125 @@ class FileOrganizer:
         # Others will be put in 'Miscellaneous'
     }
     
+    # Below this many files, moves run serially (thread startup isn't worth it)
+    PARALLEL_MOVE_THRESHOLD = 32
+    
+    # Minimum seconds between two progress callbacks (about 30 updates per second)
+    PROGRESS_INTERVAL = 0.033
+    
     def __init__(self, target_directory: str = None):
         self.target_directory = Path(target_directory) if target_directory else None
         self.logger = Logger()
         self.undo_manager = UndoManager(self.logger)
         self.custom_categories = {}
         
+        # Guards undo/log bookkeeping during parallel moves
+        self._move_lock = threading.Lock()
+        
+        # Device of the target directory, used to pick rename over copy
+        self._target_dev = None
+        self._cross_device_dirs = set()
+        
+        # (directory, directory mtime_ns, scan result) of the last scan
+        self._scan_cache = None
+        
+        self._ext_index: Dict[str, str] = {}
+        self._rebuild_extension_index()
+        
     def set_target_directory(self, directory: str):
         """Set the target directory to organize"""
         self.target_directory = Path(directory)
-        if not self.target_directory.exists():
-            raise FileNotFoundError(f"Directory does not exist: {directory}")
-        if not self.target_directory.is_dir():
+        try:
+            dir_stat = os.stat(self.target_directory)
+        except (FileNotFoundError, NotADirectoryError):
+            raise FileNotFoundError(f"Directory does not exist: {directory}") from None
+        if not stat.S_ISDIR(dir_stat.st_mode):
             raise NotADirectoryError(f"Path is not a directory: {directory}")
+        self._target_dev = dir_stat.st_dev
+        self._cross_device_dirs.clear()
+        self._scan_cache = None
     
     def add_custom_category(self, category_name: str, extensions: List[str]):
         """Add a custom file category"""
-        # Ensure extensions start with a dot
+        # Ensure extensions are lowercase and start with a dot
+        extensions = [ext.lower() for ext in extensions]
         extensions = [ext if ext.startswith('.') else f'.{ext}' for ext in extensions]
         self.custom_categories[category_name] = extensions
-    
-    def get_file_category(self, file_path: Path) -> str:
-        """Determine the category for a file based on its extension"""
-        extension = file_path.suffix.lower()
         
-        # Check custom categories first
+        # Custom categories win over the defaults; record which ones they take over
+        overridden = _BUILTIN_EXT_SET.intersection(extensions)
+        if overridden:
+            self.logger.log_operation(
+                ", ".join(sorted(overridden)), 
+                category_name, 
+                "override", 
+                "custom category"
+            )
+        
+        self._rebuild_extension_index()
+    
+    def _rebuild_extension_index(self):
+        """Flatten custom and default categories into an extension -> category map"""
+        custom_index = {}
         for category, extensions in self.custom_categories.items():
-            if extension in extensions:
-                return category
+            for extension in extensions:
+                custom_index.setdefault(extension, category)
         
-        # Check default categories
-        for category, extensions in self.FILE_CATEGORIES.items():
-            if extension in extensions:
-                return category
+        # Start from the prebuilt default map; custom categories take precedence
+        self._ext_index = {**_BUILTIN_EXT_INDEX, **custom_index}
+        self._scan_cache = None
+    
+    def get_file_category(self, file_path: Path) -> str:
+        """Determine the category for a file based on its extension"""
+        return self._get_extension_category(file_path.suffix)
+    
+    def _get_extension_category(self, extension: str) -> str:
+        """Determine the category for an extension such as '.jpg' or '.JPG'"""
+        # Most extensions are already lowercase, so only convert when needed
+        if not extension.islower():
+            extension = extension.lower()
         
         # Default category for unknown extensions
-        return 'Miscellaneous'
+        return self._ext_index.get(extension, 'Miscellaneous')
+    
+    def _iter_categorized_entries(self) -> Iterator[Tuple[str, os.DirEntry]]:
+        """Yield (category, entry) for each visible file in the target directory"""
+        # Scan only files in the root directory (not subdirectories).
+        # DirEntry.is_file() uses the type cached by scandir, so hidden
+        # files and directories are skipped without an extra stat.
+        with os.scandir(self.target_directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                    continue
+                
+                yield self._get_extension_category(os.path.splitext(name)[1]), entry
     
     def scan_directory(self) -> Dict[str, List[Path]]:
         """
         Scan the target directory and categorize files
         Returns a dictionary with categories as keys and lists of files as values
+        The result is reused while the directory's mtime is unchanged, since
+        any file added, removed or renamed in it bumps the mtime
         """
         if not self.target_directory:
             raise ValueError("Target directory not set")
         
-        categorized_files = {}
+        categorized_files = defaultdict(list)
         
         try:
-            # Scan only files in the root directory (not subdirectories)
-            for item in self.target_directory.iterdir():
-                if item.is_file() and not item.name.startswith('.'):
-                    category = self.get_file_category(item)
-                    
-                    if category not in categorized_files:
-                        categorized_files[category] = []
-                    
-                    categorized_files[category].append(item)
+            # Stat before listing so changes made during the scan invalidate it
+            dir_mtime = os.stat(self.target_directory).st_mtime_ns
+            if self._scan_cache is not None:
+                cached_dir, cached_mtime, cached_files = self._scan_cache
+                if cached_dir == self.target_directory and cached_mtime == dir_mtime:
+                    return cached_files
+            
+            for category, entry in self._iter_categorized_entries():
+                categorized_files[category].append(Path(entry.path))
+            
+            # Callers expect a plain dict (no auto-created keys on lookup)
+            categorized_files = dict(categorized_files)
             
             self.logger.log_operation(
                 str(self.target_directory), 
@@ -111,12 +184,41 @@ class FileOrganizer:
                 f"Found {sum(len(files) for files in categorized_files.values())} files"
             )
             
+            self._scan_cache = (self.target_directory, dir_mtime, categorized_files)
+            
         except Exception as e:
             self.logger.log_error(f"Error scanning directory {self.target_directory}", e)
             raise
         
         return categorized_files
     
+    def scan_directory_iter(self) -> Iterator[Tuple[str, str]]:
+        """
+        Scan the target directory lazily
+        Yields (category, filename) pairs as the directory is read, without
+        building the full listing in memory
+        """
+        if not self.target_directory:
+            raise ValueError("Target directory not set")
+        
+        file_count = 0
+        
+        try:
+            for category, entry in self._iter_categorized_entries():
+                file_count += 1
+                yield category, entry.name
+            
+            self.logger.log_operation(
+                str(self.target_directory), 
+                "scan", 
+                "scan", 
+                f"Found {file_count} files"
+            )
+            
+        except Exception as e:
+            self.logger.log_error(f"Error scanning directory {self.target_directory}", e)
+            raise
+    
     def create_category_directories(self, categories: List[str]) -> Dict[str, Path]:
         """Create directories for each category"""
         created_dirs = {}
@@ -129,6 +231,10 @@ class FileOrganizer:
                 category_path.mkdir(exist_ok=True)
                 created_dirs[category] = category_path
                 
+                # A category folder may be a mount point or a link to another disk
+                if self._target_dev is not None and os.stat(category_path).st_dev != self._target_dev:
+                    self._cross_device_dirs.add(category_path)
+                
                 # Log only if we actually created a new directory
                 if not dir_existed:
                     self.logger.log_operation(
@@ -143,26 +249,42 @@ class FileOrganizer:
         
         return created_dirs
     
-    def move_file_safely(self, source: Path, destination_dir: Path) -> Tuple[bool, str, Optional[Path]]:
+    def move_file_safely(self, source: Path, destination_dir: Path,
+                         src_dir_fd: Optional[int] = None,
+                         dst_dir_fd: Optional[int] = None) -> Tuple[bool, str, Optional[Path]]:
         """
         Move a file safely, handling name conflicts
+        When open descriptors for the source and destination directories are
+        given, names are resolved relative to them instead of from the root
         Returns: (success, message, final_path)
         """
+        if src_dir_fd is None or dst_dir_fd is None:
+            src_dir_fd = dst_dir_fd = None
+        
+        # Convert paths to strings once; they're reused for undo and logging
+        src_path = os.fspath(source)
+        
         try:
-            destination = destination_dir / source.name
-            
-            # Handle name conflicts
-            if destination.exists():
-                destination = self._get_unique_filename(destination)
+            # Handle name conflicts by reserving a free name up front
+            final_path = self._get_unique_filename(destination_dir / source.name, dst_dir_fd)
+            dst_path = os.fspath(final_path)
             
-            # Move the file
-            final_path = Path(shutil.move(str(source), str(destination)))
-            
-            # Add to undo manager
-            self.undo_manager.add_operation(str(source), str(final_path))
+            # Move the file over the reserved placeholder
+            try:
+                if src_dir_fd is not None:
+                    self._move_path_at(src_path, dst_path, src_dir_fd, dst_dir_fd)
+                else:
+                    self._move_path(src_path, dst_path, destination_dir in self._cross_device_dirs)
+            except Exception:
+                final_path.unlink(missing_ok=True)
+                raise
             
-            # Log the operation
-            self.logger.log_operation(str(source), str(final_path), "move", "success")
+            with self._move_lock:
+                # Add to undo manager
+                self.undo_manager.add_operation(src_path, dst_path)
+                
+                # Log the operation
+                self.logger.log_operation(src_path, dst_path, "move", "success")
             
             return True, f"Moved to {final_path.name}", final_path
             
@@ -171,23 +293,65 @@ class FileOrganizer:
             self.logger.log_error(error_msg, e)
             return False, error_msg, None
     
-    def _get_unique_filename(self, filepath: Path) -> Path:
-        """Generate a unique filename if the target already exists"""
+    def _move_path(self, source: str, destination: str, cross_device: bool):
+        """Move with a single rename, falling back to copy+delete across devices"""
+        if not cross_device:
+            try:
+                os.replace(source, destination)
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        
+        shutil.move(source, destination, copy_function=copy_fast)
+    
+    def _move_path_at(self, source: str, destination: str, src_dir_fd: int, dst_dir_fd: int):
+        """Rename relative to open directory descriptors, falling back across devices"""
+        try:
+            os.replace(
+                os.path.basename(source), os.path.basename(destination),
+                src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd
+            )
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        
+        shutil.move(source, destination, copy_function=copy_fast)
+    
+    def _get_unique_filename(self, filepath: Path, dir_fd: Optional[int] = None) -> Path:
+        """
+        Reserve a unique filename, adding a numeric suffix if the target already exists
+        The name is claimed by atomically creating an empty placeholder file, so
+        concurrent moves never pick the same name; the move then replaces it
+        With dir_fd, the placeholder is created relative to that open directory
+        """
         base = filepath.stem
         suffix = filepath.suffix
         parent = filepath.parent
-        counter = 1
+        new_path = filepath
+        counter = 0
         
         while True:
-            new_name = f"{base}_{counter}{suffix}"
-            new_path = parent / new_name
-            if not new_path.exists():
-                return new_path
-            counter += 1
+            try:
+                if dir_fd is None:
+                    fd = os.open(new_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                else:
+                    fd = os.open(new_path.name, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644,
+                                 dir_fd=dir_fd)
+            except FileExistsError:
+                counter += 1
+                new_path = parent / f"{base}_{counter}{suffix}"
+                continue
+            
+            os.close(fd)
+            return new_path
     
-    def organize_files(self, progress_callback=None) -> Tuple[bool, str, Dict]:
+    def organize_files(self, progress_callback=None, results_detail: bool = False) -> Tuple[bool, str, Dict]:
         """
         Organize all files in the target directory
+        With results_detail, each category also lists a FileRecord per file
+        under 'files'; otherwise only the counts are kept
         Returns: (success, message, results_dict)
         """
         if not self.target_directory:
@@ -197,8 +361,9 @@ class FileOrganizer:
             # Clear any previous operations
             self.undo_manager.clear_current_operations()
             
-            # Scan files
+            # Scan files; the cached listing goes stale once files are moved
             categorized_files = self.scan_directory()
+            self._scan_cache = None
             
             if not categorized_files:
                 return True, "No files to organize", {}
@@ -206,65 +371,225 @@ class FileOrganizer:
             # Create category directories
             categories = list(categorized_files.keys())
             category_dirs = self.create_category_directories(categories)
+            src_dir_fd, category_fds = self._open_directory_fds(category_dirs)
             
             # Move files
-            results = {
-                'total_files': sum(len(files) for files in categorized_files.values()),
-                'moved_files': 0,
-                'failed_files': 0,
-                'categories': {},
-                'errors': []
-            }
+            results = self._new_results()
+            results['total_files'] = sum(len(files) for files in categorized_files.values())
             
-            file_count = 0
-            for category, files in categorized_files.items():
-                category_results = {'moved': 0, 'failed': 0, 'files': []}
+            for category in categories:
+                self._add_result_category(results, category, results_detail)
+            
+            pending_moves = [
+                (category, file_path)
+                for category, files in categorized_files.items()
+                for file_path in files
+            ]
+            
+            if progress_callback:
+                progress_callback = self._throttle_progress(progress_callback, results['total_files'])
+            
+            try:
+                if len(pending_moves) < self.PARALLEL_MOVE_THRESHOLD:
+                    for file_count, (category, file_path) in enumerate(pending_moves):
+                        if progress_callback:
+                            progress_callback(file_count, results['total_files'], file_path.name)
+                        
+                        outcome = self.move_file_safely(
+                            file_path, category_dirs[category], src_dir_fd, category_fds.get(category)
+                        )
+                        self._record_move_result(results, category, file_path, outcome)
+                else:
+                    # Moves are I/O-bound, so threads overlap the filesystem work
+                    executor = ThreadPoolExecutor(max_workers=IO_WORKERS)
+                    try:
+                        futures = {
+                            executor.submit(
+                                self.move_file_safely, file_path, category_dirs[category],
+                                src_dir_fd, category_fds.get(category)
+                            ): (category, file_path)
+                            for category, file_path in pending_moves
+                        }
+                        
+                        for file_count, future in enumerate(as_completed(futures)):
+                            category, file_path = futures[future]
+                            if progress_callback:
+                                progress_callback(file_count, results['total_files'], file_path.name)
+                            
+                            self._record_move_result(results, category, file_path, future.result())
+                    finally:
+                        # On an error, moves that haven't started are dropped
+                        executor.shutdown(cancel_futures=True)
+            finally:
+                self._close_directory_fds(src_dir_fd, category_fds)
                 
-                for file_path in files:
-                    if progress_callback:
-                        progress_callback(file_count, results['total_files'], file_path.name)
-                    
-                    success, message, final_path = self.move_file_safely(
-                        file_path, category_dirs[category]
-                    )
-                    
-                    if success:
-                        category_results['moved'] += 1
-                        results['moved_files'] += 1
-                        category_results['files'].append({
-                            'name': file_path.name,
-                            'final_path': str(final_path),
-                            'status': 'moved'
-                        })
-                    else:
-                        category_results['failed'] += 1
-                        results['failed_files'] += 1
-                        results['errors'].append(message)
-                        category_results['files'].append({
-                            'name': file_path.name,
-                            'status': 'failed',
-                            'error': message
-                        })
-                    
-                    file_count += 1
+                # Commit operations for undo, including moves done before an error
+                self.undo_manager.commit_operations()
+            
+            return True, self._results_message(results), results
                 
-                results['categories'][category] = category_results
+        except Exception as e:
+            error_msg = f"Error during organization: {str(e)}"
+            self.logger.log_error(error_msg, e)
+            return False, error_msg, {}
+    
+    def organize_files_streaming(self, progress_callback=None) -> Tuple[bool, str, Dict]:
+        """
+        Organize all files in a single pass over the target directory
+        Each file is categorized and moved as soon as it is read, and category
+        directories are created when first needed, so only counts are kept in
+        memory. The total isn't known up front: progress_callback gets 0 as total
+        Returns: (success, message, results_dict)
+        """
+        if not self.target_directory:
+            return False, "Target directory not set", {}
+        
+        results = self._new_results()
+        category_dirs = {}
+        src_dir_fd = None
+        category_fds = {}
+        
+        if progress_callback:
+            progress_callback = self._throttle_progress(progress_callback, 0)
+        
+        try:
+            # Clear any previous operations
+            self.undo_manager.clear_current_operations()
+            self._scan_cache = None
             
-            # Commit operations for undo
-            self.undo_manager.commit_operations()
+            src_dir_fd, category_fds = self._open_directory_fds({})
             
-            # Generate final message
-            if results['failed_files'] == 0:
-                message = f"Successfully organized {results['moved_files']} files into {len(categories)} categories"
-                return True, message, results
-            else:
-                message = f"Organized {results['moved_files']} files with {results['failed_files']} failures"
-                return True, message, results
+            for category, entry in self._iter_categorized_entries():
+                if category not in category_dirs:
+                    new_dirs = self.create_category_directories([category])
+                    category_dirs.update(new_dirs)
+                    if src_dir_fd is not None:
+                        self._open_category_fds(new_dirs, category_fds)
+                    self._add_result_category(results, category)
+                
+                if progress_callback:
+                    progress_callback(results['total_files'], 0, entry.name)
+                results['total_files'] += 1
                 
+                file_path = Path(entry.path)
+                outcome = self.move_file_safely(
+                    file_path, category_dirs[category], src_dir_fd, category_fds.get(category)
+                )
+                self._record_move_result(results, category, file_path, outcome)
+            
+            if not results['total_files']:
+                return True, "No files to organize", {}
+            
+            return True, self._results_message(results), results
+            
         except Exception as e:
             error_msg = f"Error during organization: {str(e)}"
             self.logger.log_error(error_msg, e)
             return False, error_msg, {}
+        
+        finally:
+            self._close_directory_fds(src_dir_fd, category_fds)
+            
+            # Commit operations for undo, including moves done before an error
+            self.undo_manager.commit_operations()
+    
+    @staticmethod
+    def _new_results() -> Dict[str, Any]:
+        """Empty results dictionary shared by both organize methods"""
+        return {
+            'total_files': 0,
+            'moved_files': 0,
+            'failed_files': 0,
+            'categories': {},
+            'errors': []
+        }
+    
+    @staticmethod
+    def _add_result_category(results: Dict[str, Any], category: str, results_detail: bool = False):
+        """Start the per-category counts, with a 'files' list when results_detail is set"""
+        results['categories'][category] = {'moved': 0, 'failed': 0}
+        if results_detail:
+            results['categories'][category]['files'] = []
+    
+    @staticmethod
+    def _results_message(results: Dict[str, Any]) -> str:
+        """Summary message for a finished organization"""
+        if results['failed_files'] == 0:
+            return (f"Successfully organized {results['moved_files']} files "
+                    f"into {len(results['categories'])} categories")
+        return f"Organized {results['moved_files']} files with {results['failed_files']} failures"
+    
+    def _throttle_progress(self, progress_callback, total: int):
+        """
+        Wrap a progress callback so it fires at most every PROGRESS_INTERVAL
+        seconds and once per 1% of files, plus always for the first and last file
+        """
+        step = max(1, total // 100)
+        last_time = 0.0
+        last_count = -step
+        
+        def throttled(current, total, filename):
+            nonlocal last_time, last_count
+            now = time.monotonic()
+            if current == total - 1 or (
+                now - last_time >= self.PROGRESS_INTERVAL and current - last_count >= step
+            ):
+                last_time = now
+                last_count = current
+                progress_callback(current, total, filename)
+        
+        return throttled
+    
+    def _open_directory_fds(self, category_dirs: Dict[str, Path]) -> Tuple[Optional[int], Dict[str, int]]:
+        """
+        Open the target directory and same-device category directories
+        Moves then rename relative to these descriptors, skipping the
+        per-file path lookup. Returns (None, {}) where dir_fd is unsupported
+        """
+        if not DIR_FD_MOVES:
+            return None, {}
+        
+        src_dir_fd = os.open(self.target_directory, os.O_RDONLY | os.O_DIRECTORY)
+        category_fds = {}
+        try:
+            self._open_category_fds(category_dirs, category_fds)
+        except OSError:
+            self._close_directory_fds(src_dir_fd, category_fds)
+            raise
+        
+        return src_dir_fd, category_fds
+    
+    def _open_category_fds(self, category_dirs: Dict[str, Path], category_fds: Dict[str, int]):
+        """Add descriptors for the same-device category directories to category_fds"""
+        for category, category_path in category_dirs.items():
+            if category_path not in self._cross_device_dirs:
+                category_fds[category] = os.open(category_path, os.O_RDONLY | os.O_DIRECTORY)
+    
+    def _close_directory_fds(self, src_dir_fd: Optional[int], category_fds: Dict[str, int]):
+        """Close descriptors opened by _open_directory_fds"""
+        for fd in category_fds.values():
+            os.close(fd)
+        if src_dir_fd is not None:
+            os.close(src_dir_fd)
+    
+    def _record_move_result(self, results: Dict, category: str, file_path: Path,
+                            outcome: Tuple[bool, str, Optional[Path]]):
+        """Add the outcome of a single move to the organization results"""
+        success, message, final_path = outcome
+        category_results = results['categories'][category]
+        files = category_results.get('files')
+        
+        if success:
+            category_results['moved'] += 1
+            results['moved_files'] += 1
+            if files is not None:
+                files.append(FileRecord(file_path.name, str(final_path), 'moved', None))
+        else:
+            category_results['failed'] += 1
+            results['failed_files'] += 1
+            results['errors'].append(message)
+            if files is not None:
+                files.append(FileRecord(file_path.name, None, 'failed', message))
     
     def can_undo(self) -> bool:
         """Check if undo is possible"""
@@ -291,3 +616,15 @@ class FileOrganizer:
         except Exception as e:
             self.logger.log_error(f"Error generating preview", e)
             return {}
+
+
+# Default categories flattened into a lowercase extension -> category map at import;
+# iterating in reverse lets the first category listing an extension win
+_BUILTIN_EXT_INDEX: Dict[str, str] = {
+    extension.lower(): category
+    for category, extensions in reversed(FileOrganizer.FILE_CATEGORIES.items())
+    for extension in extensions
+}
+
+# Every default extension, for quick conflict checks against custom categories
+_BUILTIN_EXT_SET = frozenset(_BUILTIN_EXT_INDEX)
@@ -27,6 +27,10 @@ class SmartFileOrganizerGUI:
         self.organizer = FileOrganizer()
         self.selected_directory = None
         
+        # Latest progress from the worker thread, applied by one scheduled flush
+        self._pending_progress = None
+        self._progress_flush_scheduled = False
+        
         # Create GUI components
         self.create_widgets()
         self.update_ui_state()
@@ -157,13 +161,8 @@ class SmartFileOrganizerGUI:
             messagebox.showwarning("Warning", "Please select a directory first")
             return
         
+        preview_window = None
         try:
-            preview = self.organizer.get_preview()
-            
-            if not preview:
-                messagebox.showinfo("Preview", "No files to organize in the selected directory")
-                return
-            
             # Create preview window
             preview_window = tk.Toplevel(self.root)
             preview_window.title("Organization Preview")
@@ -184,16 +183,6 @@ class SmartFileOrganizerGUI:
             preview_text = scrolledtext.ScrolledText(frame, wrap=tk.WORD)
             preview_text.pack(fill=tk.BOTH, expand=True)
             
-            total_files = 0
-            for category, files in preview.items():
-                preview_text.insert(tk.END, f"\n📁 {category} ({len(files)} files):\n")
-                for file in files:
-                    preview_text.insert(tk.END, f"  • {file}\n")
-                total_files += len(files)
-            
-            preview_text.insert(tk.END, f"\nTotal files: {total_files}")
-            preview_text.config(state='disabled')
-            
             # Close button
             ttk.Button(
                 frame, 
@@ -201,10 +190,72 @@ class SmartFileOrganizerGUI:
                 command=preview_window.destroy
             ).pack(pady=(10, 0))
             
+            total_files = self._stream_preview(
+                preview_window, preview_text, self.organizer.scan_directory_iter()
+            )
+            
+            if not total_files:
+                preview_window.destroy()
+                messagebox.showinfo("Preview", "No files to organize in the selected directory")
+                return
+            
+            preview_text.insert(tk.END, f"\nTotal files: {total_files}")
+            preview_text.config(state='disabled')
+            
         except Exception as e:
+            if preview_window is not None:
+                preview_window.destroy()
             messagebox.showerror("Error", f"Error generating preview: {str(e)}")
             self.log_message(f"Preview error: {str(e)}")
     
+    def _stream_preview(self, preview_window, preview_text, entries) -> int:
+        """
+        Insert scanned (category, filename) pairs into the preview as they arrive
+        Each category section ends at a text mark, so files are inserted at
+        their category's mark and stay grouped under its header
+        Returns the total number of files
+        """
+        section_index = {}
+        section_counts = []
+        last_end_mark = None
+        total_files = 0
+        
+        for category, filename in entries:
+            index = section_index.get(category)
+            if index is None:
+                index = section_index[category] = len(section_counts)
+                section_counts.append(0)
+                
+                # Keep the previous section's end mark before the new header
+                if last_end_mark:
+                    preview_text.mark_gravity(last_end_mark, tk.LEFT)
+                
+                preview_text.insert(tk.END, "\n")
+                preview_text.mark_set(f"head{index}", "end-1c")
+                preview_text.mark_gravity(f"head{index}", tk.LEFT)
+                preview_text.insert(tk.END, f"📁 {category}:\n")
+                preview_text.mark_set(f"end{index}", "end-1c")
+                
+                if last_end_mark:
+                    preview_text.mark_gravity(last_end_mark, tk.RIGHT)
+                last_end_mark = f"end{index}"
+            
+            preview_text.insert(f"end{index}", f"  • {filename}\n")
+            section_counts[index] += 1
+            total_files += 1
+            
+            # Let the window paint while large directories are still being read
+            if total_files % 256 == 0:
+                preview_window.update_idletasks()
+        
+        # Headers now get their final file counts
+        for category, index in section_index.items():
+            count = section_counts[index]
+            preview_text.delete(f"head{index}", f"head{index} lineend")
+            preview_text.insert(f"head{index}", f"📁 {category} ({count} files):")
+        
+        return total_files
+    
     def start_organization(self):
         """Start the file organization process"""
         if not self.selected_directory:
@@ -234,7 +285,12 @@ class SmartFileOrganizerGUI:
         try:
             def progress_callback(current, total, filename):
                 progress = (current / total) * 100 if total > 0 else 0
-                self.root.after(0, self._update_progress, progress, f"Processing: {filename}")
+                self._pending_progress = (progress, f"Processing: {filename}")
+                
+                # Coalesce updates: only schedule a flush if none is waiting
+                if not self._progress_flush_scheduled:
+                    self._progress_flush_scheduled = True
+                    self.root.after(0, self._flush_progress)
             
             success, message, results = self.organizer.organize_files(progress_callback)
             
@@ -244,6 +300,13 @@ class SmartFileOrganizerGUI:
         except Exception as e:
             self.root.after(0, self._organization_error, str(e))
     
+    def _flush_progress(self):
+        """Apply the most recent progress reported by the worker thread"""
+        # Clear the flag first so a newer report schedules another flush
+        self._progress_flush_scheduled = False
+        if self._pending_progress is not None:
+            self._update_progress(*self._pending_progress)
+    
     def _update_progress(self, progress, message):
         """Update progress bar and message"""
         self.progress_bar['value'] = progress
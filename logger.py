@@ -3,16 +3,23 @@ Logger module for Smart File Organizer
 Handles logging of file operations for tracking and undo functionality
 """
 
-import csv
-import json
-import datetime
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 
 
 class Logger:
     """Handles logging of file operations"""
     
+    # Maximum number of queued records written between two flushes
+    WRITE_BATCH_SIZE = 256
+    
     def __init__(self, log_dir: str = "logs"):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
@@ -20,75 +27,298 @@ class Logger:
         # Log files
         self.log_file = self.log_dir / "file_operations.log"
         self.csv_log = self.log_dir / "moved_files.csv"
-        self.undo_file = self.log_dir / "undo_data.json"
+        self.undo_file = self.log_dir / "undo_data.db"
+        
+        # Log files stay open; a background thread writes queued records in batches
+        self._log_fp = self._open_append(self.log_file)
+        self._csv_fp = self._open_append(self.csv_log, newline='')
         
-        # Initialize CSV if it doesn't exist
+        # Initialize CSV if it's new
         self._init_csv_log()
+        
+        # Undo data lives in a small SQLite database
+        self._init_undo_db()
+        
+        self._queue = queue.Queue()
+        self._closed = False
+        
+        # Records held back between begin_batch() and end_batch(), or None
+        self._batch_records = None
+        self._batch_depth = 0
+        self._batch_lock = threading.Lock()
+        
+        # (epoch second, formatted timestamp) of the last formatted time
+        self._timestamp_cache = (None, "")
+        
+        self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.close)
+    
+    @staticmethod
+    def _open_append(path: Path, newline: str = None):
+        """Open a file for buffered appending, creating it if needed"""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # Undecodable filenames are escaped rather than failing the write
+        return os.fdopen(
+            fd, 'a', encoding='utf-8', errors='backslashreplace',
+            newline=newline, buffering=1 << 16
+        )
     
     def _init_csv_log(self):
-        """Initialize CSV log file with headers if it doesn't exist"""
-        if not self.csv_log.exists():
-            with open(self.csv_log, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(['Timestamp', 'Source', 'Destination', 'Operation', 'Status'])
+        """Write the CSV log headers if the file is empty"""
+        if os.fstat(self._csv_fp.fileno()).st_size == 0:
+            self._csv_fp.write('Timestamp,Source,Destination,Operation,Status\r\n')
+            self._csv_fp.flush()
+    
+    def _init_undo_db(self):
+        """Create the undo table if needed and switch the database to WAL mode"""
+        with closing(self._connect_undo_db()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS undo ("
+                "batch_id INTEGER, seq INTEGER, src BLOB, dst BLOB, typ TEXT, "
+                "PRIMARY KEY (batch_id, seq))"
+            )
+            connection.commit()
+    
+    def _connect_undo_db(self) -> sqlite3.Connection:
+        """
+        Open a connection to the undo database
+        Connections are short-lived so any thread (GUI or worker) can use them
+        """
+        return sqlite3.connect(self.undo_file)
+    
+    def _timestamp(self) -> str:
+        """Current local time as text, formatted at most once per second"""
+        now = int(time.time())
+        cached_second, cached_text = self._timestamp_cache
+        if now != cached_second:
+            cached_text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+            self._timestamp_cache = (now, cached_text)
+        return cached_text
     
     def log_operation(self, source: str, destination: str, operation: str = "move", status: str = "success"):
         """Log a file operation"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = self._timestamp()
         
-        # Log to text file
-        with open(self.log_file, 'a', encoding='utf-8') as file:
-            file.write(f"[{timestamp}] {operation.upper()}: {source} -> {destination} ({status})\n")
-        
-        # Log to CSV
-        with open(self.csv_log, 'a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([timestamp, source, destination, operation, status])
+        # Queue for both the text file and the CSV
+        self._enqueue(
+            f"[{timestamp}] {operation.upper()}: {source} -> {destination} ({status})\n",
+            [timestamp, source, destination, operation, status]
+        )
     
     def log_error(self, message: str, error: Exception = None):
         """Log an error message"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = self._timestamp()
         error_msg = f"[{timestamp}] ERROR: {message}"
         if error:
             error_msg += f" - {str(error)}"
         
-        with open(self.log_file, 'a', encoding='utf-8') as file:
-            file.write(error_msg + "\n")
+        self._enqueue(error_msg + "\n")
+    
+    def begin_batch(self):
+        """
+        Hold back log records until the matching end_batch()
+        Batches may nest; records are released when the outermost one ends
+        """
+        with self._batch_lock:
+            if self._batch_depth == 0:
+                self._batch_records = []
+            self._batch_depth += 1
     
-    def save_undo_data(self, operations: List[Dict[str, Any]]):
-        """Save operations data for undo functionality"""
-        undo_data = {
-            'timestamp': datetime.datetime.now().isoformat(),
-            'operations': operations
-        }
+    def end_batch(self):
+        """Queue the records held since begin_batch() as a single write"""
+        with self._batch_lock:
+            if self._batch_depth == 0:
+                return
+            self._batch_depth -= 1
+            if self._batch_depth:
+                return
+            records, self._batch_records = self._batch_records, None
         
-        with open(self.undo_file, 'w', encoding='utf-8') as file:
-            json.dump(undo_data, file, indent=2)
+        if records and not self._closed:
+            self._queue.put(records)
     
-    def load_undo_data(self) -> Dict[str, Any]:
-        """Load undo data from file"""
-        if not self.undo_file.exists():
-            return {}
+    def _enqueue(self, line: str, csv_row: List[str] = None):
+        """Queue a text log line and optional CSV row for the writer thread"""
+        if self._batch_records is not None:
+            with self._batch_lock:
+                # Re-checked under the lock in case end_batch() just released it
+                if self._batch_records is not None:
+                    self._batch_records.append((line, csv_row))
+                    return
         
+        if not self._closed:
+            self._queue.put((line, csv_row))
+    
+    def _write_loop(self):
+        """Drain the queue, writing records in batches with one flush per batch"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = False
+            try:
+                for item in batch:
+                    if item is None:
+                        stop = True
+                        continue
+                    
+                    # A list is a whole batch from end_batch()
+                    records = item if isinstance(item, list) else (item,)
+                    for line, csv_row in records:
+                        self._write_record(line, csv_row)
+                
+                try:
+                    self._log_fp.flush()
+                    self._csv_fp.flush()
+                except Exception:
+                    # Logging must never take the organizer down
+                    pass
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            
+            if stop:
+                return
+    
+    def _write_record(self, line: str, csv_row: List[str] = None):
+        """
+        Write one record to the buffered log files
+        A record that can't be written is dropped so the writer thread keeps going
+        """
         try:
-            with open(self.undo_file, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        except (json.JSONDecodeError, FileNotFoundError):
+            self._log_fp.write(line)
+            if csv_row is not None:
+                self._csv_fp.write(self._format_csv_row(csv_row))
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _format_csv_row(csv_row: List[Any]) -> str:
+        """Format a CSV line with every field quoted, matching csv.writer's line ending"""
+        fields = '","'.join(str(field).replace('"', '""') for field in csv_row)
+        return f'"{fields}"\r\n'
+    
+    def flush(self):
+        """Wait until all queued log records have been written to disk"""
+        if self._closed:
+            return
+        
+        # Like queue.join(), but gives up if the writer thread is no longer running
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._writer_thread.is_alive():
+                self._queue.all_tasks_done.wait(0.1)
+    
+    def close(self):
+        """Write any queued log records and close the log files"""
+        if self._closed:
+            return
+        
+        self._closed = True
+        self._queue.put(None)
+        self._writer_thread.join()
+        self._log_fp.close()
+        self._csv_fp.close()
+        atexit.unregister(self.close)
+    
+    def save_undo_data(self, operations: List[Any]):
+        """
+        Save operations data for undo functionality
+        Operations (with source, destination and type attributes) replace the
+        previous batch in a single transaction; paths are stored as filesystem
+        bytes so names that aren't valid UTF-8 survive the round trip
+        """
+        with closing(self._connect_undo_db()) as connection, connection:
+            batch_id = connection.execute(
+                "SELECT COALESCE(MAX(batch_id), 0) + 1 FROM undo"
+            ).fetchone()[0]
+            connection.execute("DELETE FROM undo")
+            connection.executemany(
+                "INSERT INTO undo (batch_id, seq, src, dst, typ) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        batch_id, seq, os.fsencode(operation.source),
+                        os.fsencode(operation.destination), operation.type
+                    )
+                    for seq, operation in enumerate(operations)
+                )
+            )
+    
+    def load_undo_data(self) -> Dict[str, Any]:
+        """Load undo data as parallel 'sources', 'destinations' and 'types' lists"""
+        with closing(self._connect_undo_db()) as connection:
+            rows = connection.execute(
+                "SELECT src, dst, typ FROM undo ORDER BY batch_id, seq"
+            ).fetchall()
+        
+        if not rows:
             return {}
+        
+        sources, destinations, types = (list(column) for column in zip(*self._decode_rows(rows)))
+        return {'sources': sources, 'destinations': destinations, 'types': types}
+    
+    def iter_undo_data(self, chunk_size: int = 256) -> Iterator[List[Tuple[str, str, str]]]:
+        """
+        Yield the saved (source, destination, type) rows newest first
+        Rows are fetched from a cursor in chunks, so only one chunk is held
+        in memory at a time
+        """
+        with closing(self._connect_undo_db()) as connection:
+            cursor = connection.execute(
+                "SELECT src, dst, typ FROM undo ORDER BY batch_id DESC, seq DESC"
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield self._decode_rows(rows)
+    
+    @staticmethod
+    def _decode_rows(rows: List[Tuple[Any, Any, str]]) -> List[Tuple[str, str, str]]:
+        """Turn stored (source, destination, type) rows back into path strings"""
+        return [
+            (os.fsdecode(source), os.fsdecode(destination), operation_type)
+            for source, destination, operation_type in rows
+        ]
+    
+    def has_undo_data(self) -> bool:
+        """Check if there are saved operations, without loading them"""
+        with closing(self._connect_undo_db()) as connection:
+            return connection.execute("SELECT 1 FROM undo LIMIT 1").fetchone() is not None
     
     def clear_undo_data(self):
-        """Clear undo data file"""
-        if self.undo_file.exists():
-            self.undo_file.unlink()
+        """Clear undo data"""
+        with closing(self._connect_undo_db()) as connection, connection:
+            connection.execute("DELETE FROM undo")
     
     def get_recent_logs(self, limit: int = 10) -> List[str]:
-        """Get recent log entries"""
-        if not self.log_file.exists():
-            return []
-        
+        """
+        Get recent log entries
+        Only the end of the file is read, growing the window until it holds
+        enough lines
+        """
+        self.flush()
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-                return [line.strip() for line in lines[-limit:]]
+            with open(self.log_file, 'rb') as file:
+                size = file.seek(0, os.SEEK_END)
+                window = 8192
+                while True:
+                    start = max(0, size - window)
+                    file.seek(start)
+                    tail = file.read()
+                    # The first line may be cut off, so one extra newline is needed
+                    if start == 0 or tail.count(b'\n') > limit:
+                        break
+                    window *= 2
         except FileNotFoundError:
             return []
+        
+        lines = tail.decode('utf-8', errors='replace').splitlines()
+        if start > 0:
+            lines = lines[1:]
+        return [line.strip() for line in lines[-limit:]]
@@ -19,13 +19,16 @@ Usage:
     python main.py --help       # Show help
 """
 
+import os
 import sys
 import argparse
-from pathlib import Path
+import queue
+import stat
+import threading
+import time
 
-# Import our modules
-from file_organizer import FileOrganizer
-from gui import SmartFileOrganizerGUI
+# Minimum time between two CLI progress lines, in seconds
+PROGRESS_PRINT_INTERVAL = 1 / 30
 
 
 def run_cli_mode(directory_path: str):
@@ -33,6 +36,9 @@ def run_cli_mode(directory_path: str):
     print("🗂️  Smart File Organizer - CLI Mode")
     print("=" * 40)
     
+    # Imported here so --help and --version don't load the organizer
+    from file_organizer import FileOrganizer
+    
     try:
         # Initialize organizer
         organizer = FileOrganizer()
@@ -71,11 +77,60 @@ def run_cli_mode(directory_path: str):
         # Organize files
         print("\n🔄 Organizing files...")
         
+        # Only the latest update is kept; a printer thread shows it at most 30 times a second
+        progress_queue = queue.Queue(maxsize=1)
+        
         def progress_callback(current, total, filename):
-            progress = (current / total) * 100 if total > 0 else 0
-            print(f"\rProgress: {progress:.1f}% - {filename}", end="", flush=True)
+            try:
+                progress_queue.put_nowait((current, total, filename))
+            except queue.Full:
+                # Drop the stale update in favour of the newer one
+                try:
+                    progress_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                progress_queue.put_nowait((current, total, filename))
+        
+        # A failed progress print is reported once organizing is done
+        progress_errors = []
+        
+        def print_progress():
+            while True:
+                update = progress_queue.get()
+                if update is None:
+                    break
+                if progress_errors:
+                    # Keep draining so the organizer never waits on a full queue
+                    continue
+                
+                current, total, filename = update
+                progress = (current / total) * 100 if total > 0 else 0
+                try:
+                    print(f"\rProgress: {progress:.1f}% - {filename}", end="", flush=True)
+                except Exception as e:
+                    progress_errors.append(e)
+                    continue
+                
+                next_print = time.monotonic() + PROGRESS_PRINT_INTERVAL
+                time.sleep(max(0.0, next_print - time.monotonic()))
+        
+        printer = threading.Thread(target=print_progress, daemon=True)
+        printer.start()
+        try:
+            success, message, results = organizer.organize_files(progress_callback)
+        finally:
+            # The last update is still queued; the sentinel waits behind it,
+            # unless the printer thread has stopped
+            while printer.is_alive():
+                try:
+                    progress_queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            printer.join()
         
-        success, message, results = organizer.organize_files(progress_callback)
+        if progress_errors:
+            raise progress_errors[0]
         
         print()  # New line after progress
         
@@ -141,18 +196,26 @@ Examples:
     
     if args.cli:
         # Command line mode
-        directory = Path(args.cli).resolve()
-        if not directory.exists():
+        # Absolute, so logged and undo paths don't depend on the working directory
+        directory = os.path.abspath(args.cli)
+        try:
+            dir_stat = os.stat(directory)
+        except (FileNotFoundError, NotADirectoryError):
             print(f"❌ Error: Directory '{directory}' does not exist.")
             sys.exit(1)
-        if not directory.is_dir():
+        except OSError as e:
+            print(f"❌ Error: Cannot access '{directory}': {e.strerror or e}")
+            sys.exit(1)
+        if not stat.S_ISDIR(dir_stat.st_mode):
             print(f"❌ Error: '{directory}' is not a directory.")
             sys.exit(1)
         
-        run_cli_mode(str(directory))
+        run_cli_mode(directory)
     else:
         # GUI mode
         try:
+            # Imported here so CLI runs don't pay for loading tkinter
+            from gui import SmartFileOrganizerGUI
             app = SmartFileOrganizerGUI()
             app.run()
         except ImportError as e:
@@ -5,11 +5,11 @@ Run this file to test the application with sample files
 
 import os
 import tempfile
-import shutil
 from pathlib import Path
 from file_organizer import FileOrganizer
+from file_utils import copy_fast
 from logger import Logger
-from undo_manager import UndoManager
+from undo_manager import Operation, UndoManager
 
 
 def create_test_files(test_dir: Path) -> dict:
@@ -26,12 +26,28 @@ def create_test_files(test_dir: Path) -> dict:
     
     created_files = []
     
-    for category, filenames in test_files.items():
-        for filename in filenames:
-            file_path = test_dir / filename
-            # Create empty file
-            file_path.write_text(f"Sample content for {filename}")
-            created_files.append(file_path)
+    # Create files relative to one directory descriptor where supported
+    dir_fd = None
+    if os.open in os.supports_dir_fd:
+        dir_fd = os.open(test_dir, os.O_RDONLY | os.O_DIRECTORY)
+    
+    try:
+        for category, filenames in test_files.items():
+            for filename in filenames:
+                file_path = test_dir / filename
+                # Create the file with a single open/write/close
+                fd = os.open(
+                    filename if dir_fd is not None else file_path,
+                    os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd
+                )
+                try:
+                    os.write(fd, f"Sample content for {filename}".encode('utf-8'))
+                finally:
+                    os.close(fd)
+                created_files.append(file_path)
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
     
     return test_files, created_files
 
@@ -79,8 +95,9 @@ def test_file_organizer():
             for category in preview.keys():
                 category_dir = test_dir / category
                 if category_dir.exists():
-                    files_in_category = list(category_dir.glob('*'))
-                    print(f"   📁 {category}: {len(files_in_category)} files")
+                    with os.scandir(category_dir) as entries:
+                        files_in_category = sum(1 for _ in entries)
+                    print(f"   📁 {category}: {files_in_category} files")
                 else:
                     print(f"   ❌ Directory not created: {category}")
         else:
@@ -95,7 +112,8 @@ def test_file_organizer():
                 print(f"✅ Undo successful: {undo_message}")
                 
                 # Check if files are back in root
-                root_files = [f for f in test_dir.iterdir() if f.is_file()]
+                with os.scandir(test_dir) as entries:
+                    root_files = [entry.name for entry in entries if entry.is_file()]
                 print(f"   Files back in root: {len(root_files)}")
             else:
                 print(f"❌ Undo failed: {undo_message}")
@@ -106,6 +124,49 @@ def test_file_organizer():
     return True
 
 
+def test_large_directory():
+    """Test organizing enough files to use parallel moves, with name conflicts"""
+    print("\n🧪 Testing large directory organization...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_dir = Path(temp_dir)
+        
+        # Existing file in the destination forces conflict resolution
+        (test_dir / 'Documents').mkdir()
+        (test_dir / 'Documents' / 'note.txt').write_text("Existing note")
+        
+        file_count = FileOrganizer.PARALLEL_MOVE_THRESHOLD * 2
+        (test_dir / 'note.txt').write_text("New note")
+        for i in range(1, file_count):
+            (test_dir / f'note_{i}.txt').write_text(f"Note {i}")
+        
+        organizer = FileOrganizer()
+        organizer.set_target_directory(str(test_dir))
+        success, message, results = organizer.organize_files()
+        
+        if not success or results.get('moved_files') != file_count:
+            print(f"❌ Organization failed: {message}")
+            return False
+        
+        with os.scandir(test_dir / 'Documents') as entries:
+            documents = [entry.name for entry in entries]
+        if len(documents) != file_count + 1:
+            print(f"❌ Expected {file_count + 1} documents, found {len(documents)}")
+            return False
+        print(f"✅ {file_count} files moved without overwriting")
+        
+        undo_success, undo_message = organizer.undo_last_organization()
+        with os.scandir(test_dir) as entries:
+            root_files = [entry.name for entry in entries if entry.is_file()]
+        if not undo_success or len(root_files) != file_count:
+            print(f"❌ Undo failed: {undo_message}")
+            return False
+        print(f"✅ Undo successful: {undo_message}")
+    
+    print("✅ Large directory test completed!")
+    return True
+
+
 def test_logger():
     """Test the Logger class"""
     print("\n🧪 Testing Logger...")
@@ -132,14 +193,14 @@ def test_logger():
         
         # Test undo data
         test_operations = [
-            {'source': 'file1.txt', 'destination': 'Documents/file1.txt', 'type': 'move'},
-            {'source': 'file2.jpg', 'destination': 'Images/file2.jpg', 'type': 'move'}
+            Operation('file1.txt', 'Documents/file1.txt', 'move'),
+            Operation('file2.jpg', 'Images/file2.jpg', 'move')
         ]
         
         logger.save_undo_data(test_operations)
         loaded_data = logger.load_undo_data()
         
-        if loaded_data and loaded_data.get('operations'):
+        if loaded_data and loaded_data.get('sources') == ['file1.txt', 'file2.jpg']:
             print("✅ Undo data save/load working")
         else:
             print("❌ Undo data save/load failed")
@@ -150,6 +211,15 @@ def test_logger():
             print(f"✅ Recent logs retrieved: {len(recent_logs)} entries")
         else:
             print("❌ No recent logs found")
+        
+        # Queued records must all be on disk once the logger is closed
+        logger.close()
+        with open(logger.csv_log, 'r', encoding='utf-8') as file:
+            csv_lines = file.read().splitlines()
+        if len(csv_lines) == 3:
+            print("✅ All operations written to CSV log")
+        else:
+            print(f"❌ Expected 3 CSV lines, found {len(csv_lines)}")
     
     print("✅ Logger test completed!")
     return True
@@ -185,11 +255,256 @@ def test_undo_manager():
             print("✅ Operations cleared after commit")
         else:
             print("❌ Operations not cleared after commit")
+        
+        logger.close()
     
     print("✅ UndoManager test completed!")
     return True
 
 
+def test_scan_cache():
+    """Test that directory scans are cached until the directory changes"""
+    print("\n🧪 Testing scan cache...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_dir = Path(temp_dir)
+        (test_dir / 'photo.jpg').write_text("Photo")
+        (test_dir / 'data.abc').write_text("Data")
+        
+        organizer = FileOrganizer()
+        organizer.set_target_directory(str(test_dir))
+        
+        first_scan = organizer.scan_directory()
+        if organizer.scan_directory() is not first_scan:
+            print("❌ Unchanged directory was scanned again")
+            return False
+        print("✅ Unchanged directory reuses the cached scan")
+        
+        # A new file bumps the directory mtime; set it explicitly in case
+        # the filesystem's timestamps are too coarse to notice
+        (test_dir / 'song.mp3').write_text("Song")
+        dir_stat = os.stat(test_dir)
+        os.utime(test_dir, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns + 1_000_000_000))
+        
+        new_scan = organizer.scan_directory()
+        if new_scan is first_scan or 'Audio' not in new_scan:
+            print("❌ Added file did not invalidate the cached scan")
+            return False
+        print("✅ Added file invalidates the cached scan")
+        
+        organizer.add_custom_category('Data', ['abc'])
+        custom_scan = organizer.scan_directory()
+        if custom_scan is new_scan or 'Data' not in custom_scan:
+            print("❌ Custom category did not invalidate the cached scan")
+            return False
+        print("✅ add_custom_category invalidates the cached scan")
+        
+        organizer.set_target_directory(str(test_dir))
+        if organizer.scan_directory() is custom_scan:
+            print("❌ set_target_directory did not invalidate the cached scan")
+            return False
+        print("✅ set_target_directory invalidates the cached scan")
+    
+    print("✅ Scan cache test completed!")
+    return True
+
+
+def test_results_detail():
+    """Test per-file records returned with results_detail"""
+    print("\n🧪 Testing detailed results...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_dir = Path(temp_dir)
+        (test_dir / 'kept.txt').write_text("Kept")
+        (test_dir / 'vanished.txt').write_text("Vanished")
+        
+        # The first file reported is deleted just before its move, so it fails
+        def remove_first(current, total, filename):
+            if current == 0:
+                (test_dir / filename).unlink()
+        
+        organizer = FileOrganizer()
+        organizer.set_target_directory(str(test_dir))
+        success, message, results = organizer.organize_files(remove_first, results_detail=True)
+        
+        records = {record.name: record for record in results['categories']['Documents']['files']}
+        if not success or len(records) != 2:
+            print(f"❌ Expected 2 file records: {message}")
+            return False
+        
+        moved = [record for record in records.values() if record.status == 'moved']
+        failed = [record for record in records.values() if record.status == 'failed']
+        if len(moved) != 1 or len(failed) != 1:
+            print(f"❌ Expected one moved and one failed record, got {list(records.values())}")
+            return False
+        
+        expected_path = str(test_dir / 'Documents' / moved[0].name)
+        if moved[0].final_path != expected_path or moved[0].error is not None:
+            print(f"❌ Wrong record for moved file: {moved[0]}")
+            return False
+        if failed[0].final_path is not None or not failed[0].error:
+            print(f"❌ Wrong record for failed file: {failed[0]}")
+            return False
+        print("✅ FileRecords report moved and failed files")
+    
+    print("✅ Detailed results test completed!")
+    return True
+
+
+def test_copy_fast():
+    """Test the copy used for moves across filesystems"""
+    print("\n🧪 Testing copy_fast...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = Path(temp_dir) / 'source.bin'
+        destination = Path(temp_dir) / 'destination.bin'
+        source.write_bytes(b"Sample content" * 1000)
+        
+        # An mtime in the past shows whether metadata is copied
+        mtime_ns = 1_000_000_000_000_000_000
+        os.utime(source, ns=(mtime_ns, mtime_ns))
+        
+        returned = copy_fast(str(source), str(destination))
+        if returned != str(destination):
+            print(f"❌ copy_fast returned {returned!r}")
+            return False
+        if destination.read_bytes() != source.read_bytes():
+            print("❌ Copied content differs")
+            return False
+        if os.stat(destination).st_mtime_ns != mtime_ns:
+            print("❌ Modification time not preserved")
+            return False
+        print("✅ Content and modification time preserved")
+    
+    print("✅ copy_fast test completed!")
+    return True
+
+
+def test_failed_organization_undo():
+    """Test that moves done before an error can still be undone"""
+    print("\n🧪 Testing undo after a failed organization...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_dir = Path(temp_dir)
+        file_count = FileOrganizer.PARALLEL_MOVE_THRESHOLD * 8
+        for i in range(file_count):
+            (test_dir / f'note_{i}.txt').write_text(f"Note {i}")
+        
+        def failing_callback(current, total, filename):
+            raise RuntimeError("progress display closed")
+        
+        organizer = FileOrganizer()
+        organizer.set_target_directory(str(test_dir))
+        success, message, results = organizer.organize_files(failing_callback)
+        if success:
+            print("❌ Organization should have failed")
+            return False
+        
+        with os.scandir(test_dir / 'Documents') as entries:
+            moved = sum(1 for _ in entries)
+        print(f"✅ Organization stopped with an error after {moved} of {file_count} moves")
+        
+        if not organizer.can_undo():
+            print("❌ Cannot undo the moves done before the error")
+            return False
+        
+        undo_success, undo_message = organizer.undo_last_organization()
+        with os.scandir(test_dir) as entries:
+            root_files = [entry.name for entry in entries if entry.is_file()]
+        if not undo_success or len(root_files) != file_count:
+            print(f"❌ Undo failed: {undo_message}")
+            return False
+        print(f"✅ Undo successful: {undo_message}")
+    
+    print("✅ Failed organization undo test completed!")
+    return True
+
+
+def test_streaming_organizer():
+    """Test organizing in a single streaming pass"""
+    print("\n🧪 Testing streaming organization...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_dir = Path(temp_dir)
+        expected_files, created_files = create_test_files(test_dir)
+        
+        organizer = FileOrganizer()
+        organizer.set_target_directory(str(test_dir))
+        success, message, results = organizer.organize_files_streaming()
+        
+        if not success or results.get('moved_files') != len(created_files):
+            print(f"❌ Streaming organization failed: {message}")
+            return False
+        print(f"✅ {message}")
+        
+        # Every category gets exactly the files created for it
+        for category, filenames in expected_files.items():
+            moved = results['categories'].get(category, {}).get('moved', 0)
+            with os.scandir(test_dir / category) as entries:
+                on_disk = sum(1 for _ in entries)
+            if moved != len(filenames) or on_disk != len(filenames):
+                print(f"❌ {category}: expected {len(filenames)}, moved {moved}, found {on_disk}")
+                return False
+        print("✅ Per-category counts match")
+        
+        undo_success, undo_message = organizer.undo_last_organization()
+        with os.scandir(test_dir) as entries:
+            root_files = [entry.name for entry in entries if entry.is_file()]
+        if not undo_success or len(root_files) != len(created_files):
+            print(f"❌ Undo failed: {undo_message}")
+            return False
+        print(f"✅ Undo successful: {undo_message}")
+    
+    print("✅ Streaming organization test completed!")
+    return True
+
+
+def test_undo_name_conflict():
+    """Test that undo never overwrites a file created at the original path"""
+    print("\n🧪 Testing undo with a recreated original file...")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_dir = Path(temp_dir)
+        (test_dir / 'report.txt').write_text("Original report")
+        
+        organizer = FileOrganizer()
+        organizer.set_target_directory(str(test_dir))
+        success, message, results = organizer.organize_files()
+        if not success:
+            print(f"❌ Organization failed: {message}")
+            return False
+        
+        # A new file appears under the original name before undo
+        (test_dir / 'report.txt').write_text("New report")
+        
+        undo_success, undo_message = organizer.undo_last_organization()
+        restored = test_dir / 'report_restored_1.txt'
+        if not undo_success or not restored.exists():
+            print(f"❌ Undo failed: {undo_message}")
+            return False
+        if restored.read_text() != "Original report":
+            print("❌ Restored file has the wrong content")
+            return False
+        if (test_dir / 'report.txt').read_text() != "New report":
+            print("❌ New file was overwritten by undo")
+            return False
+        print("✅ Original restored as report_restored_1.txt, new file kept")
+        
+        # A file created after the directory was listed is still not replaced
+        undo_manager = organizer.undo_manager
+        taken_by_parent = {}
+        undo_manager._claim_source_name(test_dir / 'report.txt', taken_by_parent)
+        (test_dir / 'late.txt').write_text("Late file")
+        claimed = undo_manager._claim_source_name(test_dir / 'late.txt', taken_by_parent)
+        if claimed.name != 'late_restored_1.txt':
+            print(f"❌ Late file would be overwritten, claimed {claimed.name}")
+            return False
+        print("✅ Files created after listing are not overwritten")
+    
+    print("✅ Undo name conflict test completed!")
+    return True
+
+
 def main():
     """Run all tests"""
     print("🚀 Starting Smart File Organizer Tests")
@@ -199,6 +514,13 @@ def main():
         ("Logger", test_logger),
         ("UndoManager", test_undo_manager),
         ("FileOrganizer", test_file_organizer),
+        ("Large directory", test_large_directory),
+        ("Scan cache", test_scan_cache),
+        ("Detailed results", test_results_detail),
+        ("copy_fast", test_copy_fast),
+        ("Failed organization undo", test_failed_organization_undo),
+        ("Streaming organization", test_streaming_organizer),
+        ("Undo name conflict", test_undo_name_conflict),
     ]
     
     passed = 0
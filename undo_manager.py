@@ -3,88 +3,134 @@ UndoManager module for Smart File Organizer
 Manages undo operations for file movements
 """
 
+import errno
+import os
 import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+from file_utils import DIR_FD_MOVES, IO_WORKERS, copy_fast
 from logger import Logger
 
 
+# Default filesystems on these platforms ignore case when matching names
+_CASE_INSENSITIVE_NAMES = sys.platform in ('win32', 'darwin')
+
+
+@dataclass(slots=True, frozen=True)
+class Operation:
+    """A single recorded file operation"""
+    source: str
+    destination: str
+    type: str = "move"
+
+
 class UndoManager:
     """Manages undo operations for file movements"""
     
-    def __init__(self, logger: Logger):
+    # Operations are undone in chunks; each chunk's directories are prepared together
+    UNDO_BATCH_SIZE = 256
+    
+    def __init__(self, logger: Logger, max_workers: Optional[int] = None):
         self.logger = logger
         self.current_operations = []
+        
+        # Whether a saved batch exists; read once here, then kept up to date
+        self._undo_available = self.logger.has_undo_data()
+        
+        # Undo moves are I/O-bound; oversized pools hurt throughput, so cap at 16
+        if max_workers is None:
+            max_workers = IO_WORKERS
+        self.max_workers = min(16, max_workers)
+        
+        # Guard the directory descriptor and name caches shared by undo workers
+        self._dir_fds_lock = threading.Lock()
+        self._names_lock = threading.Lock()
     
     def add_operation(self, source: str, destination: str, operation_type: str = "move"):
         """Add an operation to the current batch"""
-        operation = {
-            'source': source,
-            'destination': destination,
-            'type': operation_type
-        }
-        self.current_operations.append(operation)
+        self.current_operations.append(Operation(source, destination, operation_type))
     
     def commit_operations(self):
         """Save current operations batch for undo and clear the batch"""
         if self.current_operations:
             self.logger.save_undo_data(self.current_operations)
-            self.current_operations = []
+            self._undo_available = True
+            self.current_operations.clear()
     
     def can_undo(self) -> bool:
         """Check if undo operation is possible"""
-        undo_data = self.logger.load_undo_data()
-        return bool(undo_data.get('operations', []))
+        return self._undo_available
     
     def undo_last_operation(self) -> tuple[bool, str]:
         """
         Undo the last batch of operations
         Returns: (success: bool, message: str)
         """
-        undo_data = self.logger.load_undo_data()
-        operations = undo_data.get('operations', [])
+        # Saved operations stream back newest first, one chunk at a time
+        chunks = self.logger.iter_undo_data(self.UNDO_BATCH_SIZE)
+        first_chunk = next(chunks, None)
         
-        if not operations:
+        if not first_chunk:
+            # The saved batch may have been cleared by another organizer sharing the logs
+            self._undo_available = False
             return False, "No operations to undo"
         
         success_count = 0
         error_count = 0
         errors = []
         
-        # Reverse the operations to undo them
-        for operation in reversed(operations):
-            try:
-                source = Path(operation['source'])
-                destination = Path(operation['destination'])
+        # Directory descriptors shared by all renames, keyed by directory path
+        dir_fds = {}
+        
+        # Names present in each source directory, listed once per directory
+        taken_by_parent = {}
+        
+        # Source directories already ensured, so each is created at most once
+        ready_parents = set()
+        
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(first_chunk)))
+        try:
+            for rows in chain((first_chunk,), chunks):
+                batch = [Operation(*row) for row in rows]
                 
-                if operation['type'] == 'move' and destination.exists():
-                    # Move file back to original location
-                    # Ensure the source directory exists
-                    source.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Handle name conflicts
-                    if source.exists():
-                        source = self._get_unique_filename(source)
-                    
-                    shutil.move(str(destination), str(source))
-                    self.logger.log_operation(
-                        str(destination), str(source), "undo", "success"
-                    )
-                    success_count += 1
-                else:
-                    error_msg = f"Cannot undo: {destination} does not exist"
-                    errors.append(error_msg)
-                    self.logger.log_error(error_msg)
-                    error_count += 1
-                    
-            except Exception as e:
-                error_msg = f"Error undoing operation {operation}: {str(e)}"
-                errors.append(error_msg)
-                self.logger.log_error(error_msg, e)
-                error_count += 1
+                # Ensure the source directories exist before moving anything back
+                new_parents = {Path(operation.source).parent for operation in batch} - ready_parents
+                ready_parents |= new_parents
+                for parent in new_parents:
+                    try:
+                        parent.mkdir(parents=True, exist_ok=True)
+                    except OSError:
+                        # Reported per operation when its move fails
+                        pass
+                
+                # Each chunk's log records are written together as the chunk finishes
+                self.logger.begin_batch()
+                try:
+                    # Sources are distinct, so the moves can run in parallel
+                    for success, error_msg in executor.map(
+                        lambda operation: self._undo_one(operation, dir_fds, taken_by_parent), batch
+                    ):
+                        if success:
+                            success_count += 1
+                        else:
+                            errors.append(error_msg)
+                            error_count += 1
+                finally:
+                    self.logger.end_batch()
+        finally:
+            chunks.close()
+            executor.shutdown()
+            for fd in dir_fds.values():
+                os.close(fd)
         
         # Clear undo data after attempting undo
         self.logger.clear_undo_data()
+        self._undo_available = False
         
         if error_count == 0:
             message = f"Successfully undone {success_count} operations"
@@ -96,26 +142,132 @@ class UndoManager:
             message = f"Undo failed: {error_count} errors"
             return False, message
     
-    def _get_unique_filename(self, filepath: Path) -> Path:
-        """Generate a unique filename if the target already exists"""
-        if not filepath.exists():
-            return filepath
+    def _undo_one(self, operation: Operation, dir_fds: Dict[Path, int],
+                  taken_by_parent: Dict[Path, set]) -> Tuple[bool, Optional[str]]:
+        """
+        Undo a single operation
+        Returns: (success, error_message)
+        """
+        try:
+            source = Path(operation.source)
+            destination = Path(operation.destination)
+            
+            if operation.type == 'move':
+                # Move file back to original location
+                # Handle name conflicts
+                source = self._claim_source_name(source, taken_by_parent)
+                
+                # A missing destination makes the rename itself fail, no stat needed
+                try:
+                    self._move_back(destination, source, dir_fds)
+                except FileNotFoundError:
+                    pass
+                else:
+                    self.logger.log_operation(
+                        str(destination), str(source), "undo", "success"
+                    )
+                    return True, None
+            
+            error_msg = f"Cannot undo: {destination} does not exist"
+            self.logger.log_error(error_msg)
+            return False, error_msg
+            
+        except Exception as e:
+            error_msg = f"Error undoing operation {operation}: {str(e)}"
+            self.logger.log_error(error_msg, e)
+            return False, error_msg
+    
+    def _move_back(self, destination: Path, source: Path, dir_fds: Dict[Path, int]):
+        """
+        Rename a moved file back to its source with a single rename
+        Where supported, the rename is relative to directory descriptors that
+        are opened once and reused for every file in the same directories
+        """
+        try:
+            if DIR_FD_MOVES:
+                os.rename(
+                    destination.name, source.name,
+                    src_dir_fd=self._get_dir_fd(destination.parent, dir_fds),
+                    dst_dir_fd=self._get_dir_fd(source.parent, dir_fds)
+                )
+            else:
+                os.rename(destination, source)
+            return
+        except OSError as e:
+            # Only a move across devices needs shutil's copy+delete
+            if e.errno != errno.EXDEV:
+                raise
+        
+        shutil.move(str(destination), str(source), copy_function=copy_fast)
+    
+    def _get_dir_fd(self, directory: Path, dir_fds: Dict[Path, int]) -> int:
+        """Return an open descriptor for directory, opening it on first use"""
+        # Cached descriptors are read without taking the lock
+        fd = dir_fds.get(directory)
+        if fd is not None:
+            return fd
         
+        with self._dir_fds_lock:
+            fd = dir_fds.get(directory)
+            if fd is None:
+                fd = dir_fds[directory] = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            return fd
+    
+    def _claim_source_name(self, source: Path, taken_by_parent: Dict[Path, set]) -> Path:
+        """
+        Pick the path a file is restored to, renaming it if the original is taken
+        Each directory is listed once; later checks are set lookups, and the
+        chosen name is added so other files in the batch can't claim it.
+        The chosen name is confirmed on disk right before use, since the rename
+        would replace a file created after the directory was listed
+        """
+        while True:
+            with self._names_lock:
+                taken = taken_by_parent.get(source.parent)
+                if taken is None:
+                    taken = taken_by_parent[source.parent] = {
+                        self._name_key(name) for name in os.listdir(source.parent)
+                    }
+                candidate = self._get_unique_filename(source, taken)
+            
+            # Taken names stay in the set, so the next pass picks a new one
+            if not os.path.lexists(candidate):
+                return candidate
+    
+    @staticmethod
+    def _name_key(name: str) -> str:
+        """Normalize a filename the way the filesystem compares names"""
+        return name.casefold() if _CASE_INSENSITIVE_NAMES else name
+    
+    def _is_name_taken(self, path: Path, taken: Optional[set]) -> bool:
+        """Check a candidate path against the taken names, or the filesystem"""
+        if taken is None:
+            return path.exists()
+        return self._name_key(path.name) in taken
+    
+    def _get_unique_filename(self, filepath: Path, taken: Optional[set] = None) -> Path:
+        """
+        Generate a unique filename if the target already exists
+        With taken (names already in the directory), candidates are checked
+        against the set instead of the filesystem, and the result is added to it
+        """
+        new_path = filepath
         base = filepath.stem
         suffix = filepath.suffix
         parent = filepath.parent
-        counter = 1
+        counter = 0
         
-        while True:
-            new_name = f"{base}_restored_{counter}{suffix}"
-            new_path = parent / new_name
-            if not new_path.exists():
-                return new_path
+        while self._is_name_taken(new_path, taken):
             counter += 1
+            new_path = parent / f"{base}_restored_{counter}{suffix}"
+        
+        if taken is not None:
+            taken.add(self._name_key(new_path.name))
+        return new_path
     
     def clear_current_operations(self):
         """Clear the current operations batch without committing"""
-        self.current_operations = []
+        self.current_operations.clear()
     
     def get_operations_count(self) -> int:
         """Get the number of operations in the current batch"""